@@ -1,16 +1,59 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
 import json
 import os
-from datetime import datetime
+from datetime import datetime, date
 import uuid
+import hashlib
+import shutil
+import threading
+import queue
+import copy
+import bisect
+import heapq
+import csv
+import time
+from itertools import accumulate
 from tkinter import font
 
 class FinanceManager:
+    # Cash denominations per currency: bills are whole units, coins may be fractional
+    DENOMINATIONS = {
+        "EUR": {"bills": ["500", "200", "100", "50", "20", "10", "5"], "coins": ["2", "1", "0.5", "0.2", "0.1"]},
+        "USD": {"bills": ["100", "50", "20", "10", "5", "2", "1"], "coins": ["1", "0.5", "0.25", "0.1", "0.05", "0.01"]},
+        "GBP": {"bills": ["50", "20", "10", "5"], "coins": ["2", "1", "0.5", "0.2", "0.1", "0.05", "0.02", "0.01"]},
+        "CHF": {"bills": ["1000", "200", "100", "50", "20", "10"], "coins": ["5", "2", "1", "0.5", "0.2", "0.1", "0.05"]},
+        "PLN": {"bills": ["500", "200", "100", "50", "20", "10"], "coins": ["5", "2", "1", "0.5", "0.2", "0.1", "0.05", "0.02", "0.01"]}
+    }
+    CURRENCY_SYMBOLS = {"EUR": "€", "USD": "$", "GBP": "£"}
+    # Chart views stay inside what datetime.fromtimestamp accepts everywhere (1970-01-03 .. 3000-01-01)
+    CHART_TIME_RANGE = (172800.0, 32503680000.0)
+
     def __init__(self, root):
         self.root = root
         self.root.title("Personal Finance Manager")
         self.data_file = "finance_data.json"
+        self.rates_file = "exchange_rates.json"
+        self.snapshot_file = self.data_file + ".good"  # Last copy that verified clean on load
+        self.backup_count = 5  # Rotating backups: finance_data.json.1 (newest) .. .5
+        self.verify_interval_ms = 300000  # Periodic background verification
+        self.verify_thread = None
+        self.verify_pending = False
+        self.verify_results = queue.Queue()
+        self.file_lock = threading.Lock()  # Serializes the verifier's read with save_data's rotate/replace
+        self.ignored_drift = set()  # Drifted paths the user chose to keep as they are
+        self.series_cache = {}  # path -> precomputed running-balance series, cleared on save
+        self.chart = None  # State of the open balance chart window, if any
+        self.data_version = 0  # Bumped on every save so cached renders can tell they are stale
+        self.dirty = set()  # UI parts waiting for the next flush_refresh
+        self.refresh_job = None
+        self.refresh_delay = 0
+        self.select_delay_ms = 40  # Debounce for tree navigation
+        self.detail_views = {}  # Category type -> reusable detail view widgets
+        self.rendered_details = None  # (path, data_version) currently shown in the details pane
+        self.rollup_cache = {}  # path -> (balance in the category's currency, currencies missing a rate)
+        self.last_manifest = {}  # Manifest of the last save, diffed to invalidate rollup_cache
+        self.load_rates()
         self.categories = {"children": {}, "type": "Virtual", "balance": 0.0, "transactions": []}
         # Initialize style
         self.style = ttk.Style()
@@ -30,25 +73,278 @@ class FinanceManager:
         # GUI Components
         self.create_gui()
         self.transaction_tree = None  # Initialize here to persist
+        self.root.after(1000, self.poll_verify_results)
+        self.root.after(self.verify_interval_ms, self.schedule_periodic_verify)
 
     def load_data(self):
-        """Load data from JSON file, handle errors, and ensure balance keys."""
+        """Load data from JSON file, verify it against its manifest, and recover from backups if needed."""
         try:
             if os.path.exists(self.data_file):
                 with open(self.data_file, 'r') as f:
                     loaded_data = json.load(f)
                 if not isinstance(loaded_data, dict):
                     raise ValueError("JSON root must be a dictionary")
+                manifest = loaded_data.pop("integrity", None)
                 self.categories = loaded_data
+                clean = True
+                if manifest is not None:
+                    clean = self.repair_categories(manifest, self.backup_files())
                 self.ensure_balance_keys(self.categories)
+                self.check_drift(self.categories)
+                if clean:
+                    shutil.copy2(self.data_file, self.snapshot_file)
             else:
                 self.save_data()
         except (json.JSONDecodeError, ValueError) as e:
-            messagebox.showerror("Error", f"Corrupted JSON file: {str(e)}. Starting with empty data.")
-            self.categories = {"children": {}, "type": "Virtual", "balance": 0.0, "transactions": []}
+            self.recover_data(str(e))
+
+    def backup_files(self):
+        """Return existing backup files, newest first, followed by the last good snapshot."""
+        candidates = [f"{self.data_file}.{i}" for i in range(1, self.backup_count + 1)] + [self.snapshot_file]
+        return [path for path in candidates if os.path.exists(path)]
+
+    def read_backup(self, backup_file):
+        """Parse a backup file into (categories, manifest), or None if it is unreadable."""
+        try:
+            with open(backup_file, 'r') as f:
+                return self.parse_saved_data(f.read())
+        except OSError:
+            return None
+
+    def parse_saved_data(self, text):
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        return data, data.pop("integrity", None)
+
+    def recover_data(self, error):
+        """Rebuild the ledger from the newest readable backup when the data file cannot be parsed."""
+        if os.path.exists(self.data_file):
+            shutil.copy2(self.data_file, self.data_file + ".corrupt")
+        backups = self.backup_files()
+        for i, backup_file in enumerate(backups):
+            backup = self.read_backup(backup_file)
+            if backup is None:
+                continue
+            self.categories, manifest = backup
+            if manifest is not None:
+                self.repair_categories(manifest, backups[i + 1:])
+            self.ensure_balance_keys(self.categories)
+            self.save_data(rotate=False)
+            messagebox.showwarning("Recovered", f"Corrupted JSON file: {error}.\nRecovered data from '{backup_file}'. "
+                                   f"The damaged file was kept as '{self.data_file}.corrupt'.")
+            return
+        messagebox.showerror("Error", f"Corrupted JSON file: {error}. No usable backup found. Starting with empty data.")
+        self.categories = {"children": {}, "type": "Virtual", "balance": 0.0, "transactions": []}
+        self.save_data(rotate=False)
+
+    def repair_categories(self, manifest, backups):
+        """Restore only the categories that fail their checksum, pulling exact matches from backups.
+
+        Backups are parsed lazily, newest first, and only until every damaged category
+        is resolved. Returns True if the data verified clean without repairs.
+        """
+        if not isinstance(manifest, dict):
+            return False
+        issues = [issue for issue in self.verify_categories(self.categories, manifest) if issue[1] != "drift"]
+        damaged = sorted({path for path, kind, _ in issues if kind in ("corrupt", "missing")}, key=lambda p: p.count(".") if p else -1)
+        if not damaged:
+            if issues:
+                messagebox.showwarning("Integrity Check", "Problems were found in the data file:\n" + "\n".join(message for _, _, message in issues[:20]))
+            return not issues
+        restored = []
+        for backup_file in backups:
+            if not damaged:
+                break
+            backup = self.read_backup(backup_file)
+            if backup is None:
+                continue
+            backup_categories = backup[0]
+            for path in list(damaged):
+                source = self.find_category(backup_categories, path)
+                if source is None or self.category_checksum(source) != manifest[path].get("checksum"):
+                    continue
+                if self.restore_category(path, source):
+                    damaged.remove(path)
+                    restored.append(f"{path or '(root)'} from {backup_file}")
+        lines = [message for path, kind, message in issues if kind not in ("corrupt", "missing") or path in damaged]
+        if restored:
+            lines.insert(0, "Restored: " + "; ".join(restored))
+        messagebox.showwarning("Integrity Check", "Problems were found in the data file:\n" + "\n".join(lines[:20]))
+        if restored:
+            self.save_data(rotate=False)
+        return False
+
+    def restore_category(self, path, source):
+        """Replace a category's own fields with those from a backup, keeping its current children."""
+        target = self.find_category(self.categories, path)
+        if target is None:
+            parent_path, _, name = path.rpartition(".")
+            parent = self.find_category(self.categories, parent_path)
+            if parent is None:
+                return False
+            target = parent["children"].setdefault(name, {"children": {}})
+        children = target.get("children", {})
+        target.clear()
+        target.update(copy.deepcopy({k: v for k, v in source.items() if k != "children"}))
+        target["children"] = children if isinstance(children, dict) else {}
+        return True
+
+    def find_category(self, root, path):
+        """Like get_category, but on any tree and returning None instead of raising."""
+        current = root
+        for part in path.split(".") if path else []:
+            children = current.get("children") if isinstance(current, dict) else None
+            if not isinstance(children, dict) or part not in children:
+                return None
+            current = children[part]
+        return current if isinstance(current, dict) else None
+
+    def walk_categories(self, category, path=""):
+        """Yield (path, category) for a category and all of its descendants."""
+        yield path, category
+        children = category.get("children")
+        if isinstance(children, dict):
+            for name, child in children.items():
+                if isinstance(child, dict):
+                    yield from self.walk_categories(child, f"{path}.{name}" if path else name)
+
+    def category_checksum(self, category):
+        """Hash a category's own fields; children are covered by their own manifest entries."""
+        own = {k: v for k, v in category.items() if k != "children"}
+        return hashlib.sha256(json.dumps(own, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def transaction_totals(self, category):
+        """Return (count, sum of amounts) for a category's transactions."""
+        transactions = category.get("transactions")
+        if not isinstance(transactions, list):
+            return 0, 0.0
+        total = 0.0
+        for trans in transactions:
+            try:
+                total += float(trans.get("amount", 0.0))
+            except (AttributeError, TypeError, ValueError):
+                pass
+        return len(transactions), round(total, 2)
+
+    def build_manifest(self):
+        """Build per-category checksums with stored transaction counts and totals."""
+        manifest = {}
+        for path, category in self.walk_categories(self.categories):
+            count, total = self.transaction_totals(category)
+            manifest[path] = {
+                "checksum": self.category_checksum(category),
+                "count": count,
+                "total": total,
+                "balance": category.get("balance", 0.0)
+            }
+        return manifest
+
+    def verify_categories(self, categories, manifest):
+        """Compare a category tree with a manifest and return a list of (path, kind, message) issues."""
+        issues = []
+        for path, expected in manifest.items():
+            if not isinstance(expected, dict):
+                continue
+            label = path or "(root)"
+            category = self.find_category(categories, path)
+            if category is None:
+                issues.append((path, "missing", f"'{label}' is missing"))
+                continue
+            if self.category_checksum(category) == expected.get("checksum"):
+                continue
+            count, total = self.transaction_totals(category)
+            details = []
+            if count != expected.get("count"):
+                details.append(f"{count} transactions instead of {expected.get('count')}")
+            if total != expected.get("total"):
+                details.append(f"transactions sum to {total:.2f} instead of {expected.get('total', 0.0):.2f}")
+            if category.get("balance") != expected.get("balance"):
+                details.append(f"balance {category.get('balance')} instead of {expected.get('balance')}")
+            issues.append((path, "corrupt", f"'{label}' failed its checksum" + (f": {', '.join(details)}" if details else "")))
+        for path, category in self.walk_categories(categories):
+            if path not in manifest:
+                issues.append((path, "unexpected", f"'{path}' is not in the manifest"))
+        issues.extend(self.find_drift(categories))
+        return issues
+
+    def find_drift(self, categories):
+        """Find Virtual categories whose stored balance differs from the sum of their transactions."""
+        issues = []
+        for path, category in self.walk_categories(categories):
+            if category.get("type", "Virtual") != "Virtual" or not isinstance(category.get("balance"), (int, float)):
+                continue
+            count, total = self.transaction_totals(category)
+            if count and abs(category["balance"] - total) > 0.005:
+                issues.append((path, "drift", f"'{path or '(root)'}' balance {category['balance']:.2f} differs from its transactions ({total:.2f})"))
+        return issues
+
+    def check_drift(self, categories):
+        """Offer to rebuild drifted balances from their transactions."""
+        drift = [issue for issue in self.find_drift(categories) if issue[0] not in self.ignored_drift]
+        if not drift:
+            return
+        message = "\n".join(text for _, _, text in drift[:20])
+        if messagebox.askyesno("Balance Drift", f"{message}\n\nRebuild these balances from their transactions?"):
+            for path, _, _ in drift:
+                category = self.find_category(categories, path)
+                category["balance"] = self.transaction_totals(category)[1]
             self.save_data()
+        else:
+            self.ignored_drift.update(path for path, _, _ in drift)
+
+    def start_background_verify(self):
+        """Re-read the data file on a worker thread and verify it against its own manifest."""
+        if self.verify_thread is not None and self.verify_thread.is_alive():
+            self.verify_pending = True
+            return
+        self.verify_pending = False
+        self.verify_thread = threading.Thread(target=self.verify_data_file, daemon=True)
+        self.verify_thread.start()
+
+    def verify_data_file(self):
+        """Worker thread body: never touches Tk, only posts results to verify_results."""
+        # Hold the file only while reading it; on Windows an open handle makes save_data's os.replace fail
+        try:
+            with self.file_lock:
+                with open(self.data_file, 'r') as f:
+                    text = f.read()
+        except OSError:
+            text = ""
+        backup = self.parse_saved_data(text)
+        if backup is None:
+            self.verify_results.put([("", "corrupt", f"'{self.data_file}' cannot be parsed")])
+            return
+        categories, manifest = backup
+        self.verify_results.put(self.verify_categories(categories, manifest) if isinstance(manifest, dict) else self.find_drift(categories))
 
-    def ensure_balance_keys(self, category):
+    def schedule_periodic_verify(self):
+        self.start_background_verify()
+        self.root.after(self.verify_interval_ms, self.schedule_periodic_verify)
+
+    def poll_verify_results(self):
+        """Handle background verification results on the Tk thread."""
+        try:
+            while True:
+                issues = self.verify_results.get_nowait()
+                if any(kind != "drift" for _, kind, _ in issues):
+                    # The in-memory ledger is authoritative; rewrite the damaged file from it
+                    messagebox.showwarning("Integrity Check", "The data file on disk was damaged and has been rewritten:\n" +
+                                           "\n".join(text for _, _, text in issues[:20]))
+                    self.save_data(rotate=False)
+                elif issues:
+                    self.check_drift(self.categories)
+                    self.request_refresh("tree", "details", "chart")
+        except queue.Empty:
+            pass
+        if self.verify_pending:
+            self.start_background_verify()
+        self.root.after(1000, self.poll_verify_results)
+
+    def ensure_balance_keys(self, category, currency="EUR"):
         """Recursively ensure every category has required keys and correct structure."""
         if "balance" not in category:
             category["balance"] = 0.0
@@ -58,38 +354,215 @@ class FinanceManager:
             category["transactions"] = []
         if "children" not in category or not isinstance(category["children"], dict):
             category["children"] = {}
+        if category["type"] == "Summary":
+            category.pop("currency", None)  # Summaries always roll up into the base currency
+        elif "currency" not in category:
+            category["currency"] = currency  # Inherited from the parent; the root's is the base currency
         if category["type"] == "Cash" and "denominations" not in category:
-            category["denominations"] = {
-                "bills": {"500": 0, "200": 0, "100": 0, "50": 0, "20": 0, "10": 0, "5": 0},
-                "coins": {"2": 0, "1": 0, "0.5": 0, "0.2": 0, "0.1": 0}
-            }
+            category["denominations"] = self.new_denominations(category["currency"])
         for child in category["children"].values():
-            self.ensure_balance_keys(child)
-
-    def save_data(self):
-        """Save data to JSON file."""
-        with open(self.data_file, 'w') as f:
-            json.dump(self.categories, f, indent=4)
+            self.ensure_balance_keys(child, category.get("currency", currency))
+
+    def new_denominations(self, currency):
+        """Return an all-zero denomination count for a currency's bills and coins."""
+        denominations = self.DENOMINATIONS.get(currency, {"bills": [], "coins": []})
+        return {kind: {denom: 0 for denom in denominations[kind]} for kind in ("bills", "coins")}
+
+    def base_currency(self):
+        return self.categories.get("currency", "EUR")
+
+    def category_currency(self, category):
+        """Currency a category's balance is shown in; Summary categories use the base currency."""
+        if category.get("type") == "Summary":
+            return self.base_currency()
+        return category.get("currency", self.base_currency())
+
+    def format_money(self, amount, currency, compact=False):
+        """Format an amount with its currency symbol (or code); compact drops a zero fraction."""
+        text = f"{amount:.2f}"
+        if compact and float(amount).is_integer():
+            text = str(int(amount))
+        symbol = self.CURRENCY_SYMBOLS.get(currency)
+        return f"{symbol}{text}" if symbol else f"{text} {currency}"
+
+    def load_rates(self):
+        """Load the local exchange-rate table.
+
+        The file holds dated rates against a pivot currency, quoted as units of the
+        currency per one pivot unit: {"pivot": "EUR", "rates": {"USD": {"2025-10-01": 1.08}}}.
+        """
+        self.rates = {"pivot": "EUR", "rates": {}}
+        if os.path.exists(self.rates_file):
+            try:
+                with open(self.rates_file, 'r') as f:
+                    loaded = json.load(f)
+                if not isinstance(loaded, dict) or not isinstance(loaded.get("rates"), dict):
+                    raise ValueError("expected a 'rates' dictionary")
+                pivot = loaded.get("pivot", "EUR")
+                if not isinstance(pivot, str):
+                    raise ValueError("'pivot' must be a currency code")
+                # Keep only well-formed {currency: {"YYYY-MM-DD": positive rate}} entries
+                rates, skipped = {}, []
+                for currency, dated in loaded["rates"].items():
+                    if not isinstance(dated, dict):
+                        skipped.append(str(currency))
+                        continue
+                    for day, rate in dated.items():
+                        try:
+                            date.fromisoformat(day)
+                            rate = float(rate)
+                            if not rate > 0:
+                                raise ValueError(day)
+                        except (TypeError, ValueError):
+                            skipped.append(f"{currency} {day}")
+                            continue
+                        rates.setdefault(currency, {})[day] = rate
+                self.rates = {"pivot": pivot, "rates": rates}
+                if skipped:
+                    messagebox.showwarning("Exchange Rates", f"Ignored invalid rates in '{self.rates_file}': {', '.join(skipped[:10])}")
+            except (OSError, json.JSONDecodeError, ValueError) as e:
+                messagebox.showerror("Error", f"Cannot read exchange rates from '{self.rates_file}': {str(e)}")
+        self.update_current_rates()
+
+    def update_current_rates(self):
+        """Pick the latest rate not dated in the future for each currency and drop cached conversions."""
+        today = date.today().isoformat()
+        self.current_rates = {self.rates.get("pivot", "EUR"): 1.0}
+        for currency, dated in self.rates["rates"].items():
+            usable = [day for day in dated if day <= today]
+            if usable:
+                self.current_rates[currency] = float(dated[max(usable)])
+        self.rollup_cache.clear()
+        self.series_cache.clear()
+
+    def import_rates(self):
+        """Merge a CSV of date,currency,rate rows into the local rate table."""
+        file_path = filedialog.askopenfilename(title="Exchange rates", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not file_path:
+            return
+        imported, skipped = 0, []
+        try:
+            with open(file_path, newline="", encoding="utf-8-sig") as f:
+                for number, row in enumerate(csv.reader(f), start=1):
+                    try:
+                        day = self.parse_statement_date(row[0]).isoformat()
+                        currency = row[1].strip().upper()
+                        rate = self.parse_statement_amount(row[2])
+                        if rate <= 0 or not currency:
+                            raise ValueError(f"Invalid rate on line {number}")
+                    except (IndexError, ValueError):
+                        if number > 1:  # The first line may be a header
+                            skipped.append(number)
+                        continue
+                    self.rates["rates"].setdefault(currency, {})[day] = rate
+                    imported += 1
+        except (OSError, csv.Error) as e:
+            messagebox.showerror("Error", f"Cannot read exchange rates: {str(e)}")
+            return
+        tmp_file = self.rates_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(self.rates, f, indent=4, sort_keys=True)
+        os.replace(tmp_file, self.rates_file)
+        self.update_current_rates()
+        self.update_currency_choices()
+        self.request_refresh("tree", "details", "chart")
+        messagebox.showinfo("Exchange Rates", f"Imported {imported} rates" + (f", skipped lines {skipped[:10]}" if skipped else "") + ".")
+
+    def convert(self, amount, from_currency, to_currency):
+        """Convert using the current rates; raises KeyError naming a currency without a rate."""
+        if from_currency == to_currency:
+            return amount
+        for currency in (from_currency, to_currency):
+            if currency not in self.current_rates:
+                raise KeyError(currency)
+        return amount / self.current_rates[from_currency] * self.current_rates[to_currency]
+
+    def currency_choices(self):
+        return sorted(set(self.DENOMINATIONS) | set(self.current_rates))
+
+    def invalidate_rollups(self, manifest):
+        """Drop cached rollups for categories whose checksum changed since the last save, and their ancestors."""
+        previous, self.last_manifest = self.last_manifest, manifest
+        if not previous:
+            self.rollup_cache.clear()
+            return
+        changed = {path for path, entry in manifest.items() if previous.get(path, {}).get("checksum") != entry["checksum"]}
+        changed.update(previous.keys() - manifest.keys())
+        for path in changed:
+            while True:
+                self.rollup_cache.pop(path, None)
+                if not path:
+                    break
+                path = path.rpartition(".")[0]
+
+    def save_data(self, rotate=True):
+        """Atomically save data with its integrity manifest, keeping the previous file as a backup.
+
+        Saves that overwrite a file known to be damaged pass rotate=False so the
+        damaged copy does not push a good backup out of the rotation.
+        """
+        payload = dict(self.categories)
+        payload["integrity"] = self.build_manifest()
+        self.invalidate_rollups(payload["integrity"])
+        tmp_file = self.data_file + ".tmp"
+        with open(tmp_file, 'w') as f:
+            json.dump(payload, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        with self.file_lock:
+            if rotate:
+                self.rotate_backups()
+            os.replace(tmp_file, self.data_file)
+        self.data_version += 1
+        self.series_cache.clear()
+        self.start_background_verify()
+
+    def rotate_backups(self):
+        """Shift finance_data.json.N up by one and keep the current file as .1."""
+        for i in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.data_file}.{i}"):
+                os.replace(f"{self.data_file}.{i}", f"{self.data_file}.{i + 1}")
+        if os.path.exists(self.data_file):
+            try:
+                os.link(self.data_file, f"{self.data_file}.1")  # The following os.replace leaves this link on the old file
+            except OSError:
+                shutil.copy2(self.data_file, f"{self.data_file}.1")
 
     def calculate_total_balance(self, category=None):
         """Calculate total balance of all categories recursively."""
         if category is None:
             category = self.categories
-        return self.calculate_balance(category)
-
-    def calculate_balance(self, category):
+        return self.calculate_balance(category, "" if category is self.categories else None)
+
+    def calculate_balance(self, category, path=None):
+        """Balance of a category in its own currency, with children converted into it.
+
+        With a path the result is cached; save_data drops the entries of changed
+        categories and their ancestors, and new rates drop everything.
+        """
+        if path is not None and path in self.rollup_cache:
+            return self.rollup_cache[path][0]
+        currency = self.category_currency(category)
+        missing = set()
+        balance = 0.0 if category["type"] == "Summary" else category["balance"]
+        for name, child in category["children"].items():
+            child_path = None if path is None else (f"{path}.{name}" if path else name)
+            child_balance = self.calculate_balance(child, child_path)
+            if child_path is not None:
+                missing |= self.rollup_cache[child_path][1]
+            try:
+                balance += self.convert(child_balance, self.category_currency(child), currency)
+            except KeyError as e:
+                missing.add(e.args[0])
         if category["type"] == "Summary":
-            balance = sum(self.calculate_balance(child) for child in category["children"].values())
             print(f"Summary {category.get('type', 'Unknown')} balance: {balance:.2f} from {len(category['children'])} children")
-            return balance
-        balance = category["balance"]
-        for child in category["children"].values():
-            balance += self.calculate_balance(child)
         if category["type"] == "Cash":
             cash_balance = sum(int(k) * v for k, v in category["denominations"]["bills"].items()) + \
                           sum(float(k) * v for k, v in category["denominations"]["coins"].items())
             category["balance"] = cash_balance
             balance = cash_balance
+        if path is not None:
+            self.rollup_cache[path] = (balance, frozenset(missing))
         return balance
 
     def create_gui(self):
@@ -112,7 +585,9 @@ class FinanceManager:
             ("Rename Category", self.show_rename_category_form, "Rename the selected category"),
             ("Delete Category", self.show_delete_category_form, "Delete the selected category and its subcategories"),
             ("Add Transaction", self.show_add_transaction_form, "Add a transaction to a Virtual category"),
-            ("View Full Transaction History", self.show_transaction_history_from_toolbar, "View all transactions for the selected category")
+            ("View Full Transaction History", self.show_transaction_history_from_toolbar, "View all transactions for the selected category"),
+            ("Balance Chart", self.show_balance_chart, "Plot the balance over time for the selected category"),
+            ("Reconcile", self.show_reconcile_window, "Match the selected Virtual category against a bank statement (CSV)")
         ]
         self.history_button = ttk.Button(toolbar, text="View Full Transaction History", command=self.show_transaction_history_from_toolbar, state="disabled")
         self.history_button.grid(row=0, column=4, padx=5)
@@ -131,7 +606,7 @@ class FinanceManager:
 
         self.tree = ttk.Treeview(tree_frame, columns=("Balance",), selectmode="browse", height=20)
         self.tree.heading("#0", text="Category")
-        self.tree.heading("Balance", text="Balance (€)", anchor="w")  # Left-aligned header
+        self.tree.heading("Balance", text="Balance", anchor="w")  # Left-aligned header
         self.tree.column("Balance", width=133, minwidth=133, anchor="w")  # Left-aligned content
         self.tree.column("#0", width=200, minwidth=200, stretch=True)
         self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -173,12 +648,18 @@ class FinanceManager:
         self.status_frame.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(10, 0))
         self.status_label = ttk.Label(
             self.status_frame,
-            text="Total Balance: €0.00",
+            text=f"Total Balance: {self.format_money(0.0, self.base_currency())}",
             font=("TkDefaultFont", 14, "bold"),
             background="#f0f0f0",
             padding=(10, 5)
         )
         self.status_label.pack(side=tk.LEFT, padx=10)
+        ttk.Button(self.status_frame, text="Load Rates", command=self.import_rates).pack(side=tk.RIGHT, padx=(5, 10))
+        self.base_currency_var = tk.StringVar(value=self.base_currency())
+        self.base_currency_box = ttk.Combobox(self.status_frame, textvariable=self.base_currency_var, values=self.currency_choices(), width=6, state="readonly")
+        self.base_currency_box.pack(side=tk.RIGHT, padx=5)
+        self.base_currency_box.bind("<<ComboboxSelected>>", self.on_base_currency_change)
+        ttk.Label(self.status_frame, text="Base currency:", background="#f0f0f0").pack(side=tk.RIGHT)
         self.root.grid_rowconfigure(1, weight=0)
 
         self.populate_tree()
@@ -193,7 +674,21 @@ class FinanceManager:
     def update_total_balance(self):
         """Update the total balance display."""
         total = self.calculate_total_balance()
-        self.status_label.config(text=f"Total Balance: €{total:.2f}")
+        text = f"Total Balance: {self.format_money(total, self.base_currency())}"
+        missing = self.rollup_cache.get("", (0.0, frozenset()))[1]
+        if missing:
+            text += f" (no rate for {', '.join(sorted(missing))})"
+        self.status_label.config(text=text)
+
+    def update_currency_choices(self):
+        self.base_currency_box.config(values=self.currency_choices())
+
+    def on_base_currency_change(self, event):
+        """Make the selected currency the root's, so Summary rollups and the total are shown in it."""
+        self.categories["currency"] = self.base_currency_var.get()
+        self.rollup_cache.clear()  # Every Summary rollup is denominated in the base currency
+        self.save_data()
+        self.request_refresh("tree", "details", "chart")
 
     def show_tooltip(self, event, text):
         if self.tooltip:
@@ -229,12 +724,8 @@ class FinanceManager:
         self.tree.delete(*self.tree.get_children(parent))
         for name, data in sorted(category["children"].items()):
             full_path = f"{path}.{name}" if path else name
-            balance = self.calculate_balance(data)
-            # Handle both int and float types for balance
-            if isinstance(balance, int):
-                balance_str = str(balance)
-            else:
-                balance_str = f"{balance:.2f}".rstrip('0').rstrip('.') if balance.is_integer() else f"{balance:.2f}"
+            balance = self.calculate_balance(data, full_path)
+            balance_str = self.format_money(balance, self.category_currency(data), compact=True)
             iid = self.tree.insert(parent, "end", text=f"{name} ({data['type']})", values=(balance_str,), tags=(full_path,))
             self.populate_tree(iid, data, full_path)
         self.update_total_balance()
@@ -313,6 +804,11 @@ class FinanceManager:
         ttk.Radiobutton(self.actions_content, text="Subcategory", variable=level_var, value="Sub").grid(row=row, column=2, sticky=tk.W, padx=10)
         row += 1
 
+        ttk.Label(self.actions_content, text="Currency:", wraplength=300).grid(row=row, column=0, padx=10, pady=5, sticky=tk.W)
+        currency_var = tk.StringVar(value=self.base_currency())
+        ttk.Combobox(self.actions_content, textvariable=currency_var, values=self.currency_choices(), width=6, state="readonly").grid(row=row, column=1, sticky=tk.W, padx=10)
+        row += 1
+
         def submit():
             name = name_entry.get().strip()
             if not name:
@@ -326,25 +822,26 @@ class FinanceManager:
                 if name in parent["children"]:
                     messagebox.showerror("Error", f"Category '{name}' already exists in the parent.")
                     return
+                if type_var.get() == "Cash" and currency_var.get() not in self.DENOMINATIONS:
+                    messagebox.showerror("Error", f"No cash denominations are defined for {currency_var.get()}.")
+                    return
                 new_category = {
                     "children": {},
                     "type": type_var.get(),
                     "balance": 0.0 if type_var.get() != "Summary" else 0.0,
-                    "transactions": []
+                    "transactions": [],
+                    "currency": currency_var.get()
                 }
                 if type_var.get() == "Cash":
-                    new_category["denominations"] = {
-                        "bills": {"500": 0, "200": 0, "100": 0, "50": 0, "20": 0, "10": 0, "5": 0},
-                        "coins": {"2": 0, "1": 0, "0.5": 0, "0.2": 0, "0.1": 0}
-                    }
+                    new_category["denominations"] = self.new_denominations(currency_var.get())
                 elif type_var.get() == "Summary":
                     new_category.pop("balance", None)
                     new_category.pop("transactions", None)
+                    new_category.pop("currency", None)
                 parent["children"][name] = new_category
                 self.save_data()
-                self.populate_tree()
+                self.request_refresh("tree", "details", "chart")
                 name_entry.delete(0, tk.END)
-                self.update_history_button_state()
             except KeyError as e:
                 messagebox.showerror("Error", f"Invalid parent category: {str(e)}")
 
@@ -386,10 +883,9 @@ class FinanceManager:
             try:
                 parent["children"][new_name] = parent["children"].pop(old_name)
                 self.save_data()
-                self.populate_tree()
+                self.request_refresh("tree", "details", "chart")
                 name_entry.delete(0, tk.END)
                 name_entry.insert(0, new_name)
-                self.update_history_button_state()
             except KeyError:
                 messagebox.showerror("Error", "Error renaming category.")
 
@@ -418,13 +914,10 @@ class FinanceManager:
                     return
                 del parent["children"][name]
                 self.save_data()
-                self.populate_tree()
+                self.tree.selection_remove(self.tree.selection())  # populate_tree then selects the first category
                 self.clear_detail_frame()
                 self.clear_actions()
-                self.update_history_button_state()
-                if self.tree.get_children():
-                    self.tree.selection_set(self.tree.get_children()[0])
-                    self.on_tree_select(None)
+                self.request_refresh("tree", "details", "chart")
             except KeyError as e:
                 messagebox.showerror("Error", f"Error deleting category '{path}': {str(e)}")
 
@@ -436,7 +929,7 @@ class FinanceManager:
     def show_add_transaction_form(self):
         self.clear_actions()
         row = 0
-        ttk.Label(self.actions_content, text="Amount (€):", wraplength=300).grid(row=row, column=0, padx=10, pady=5, sticky="nsew")
+        ttk.Label(self.actions_content, text="Amount:", wraplength=300).grid(row=row, column=0, padx=10, pady=5, sticky="nsew")
         amount_entry = ttk.Entry(self.actions_content, width=20)
         amount_entry.grid(row=row, column=1, padx=10, pady=5, sticky="nsew")
         row += 1
@@ -466,11 +959,9 @@ class FinanceManager:
                 })
                 category["balance"] += amount
                 self.save_data()
-                self.populate_tree()
+                self.request_refresh("tree", "details", "chart")
                 amount_entry.delete(0, tk.END)
                 desc_entry.delete(0, tk.END)
-                self.on_tree_select(None)
-                self.update_history_button_state()
             except ValueError:
                 messagebox.showerror("Error", "Invalid amount. Enter a number (e.g., 10.50).")
 
@@ -480,141 +971,173 @@ class FinanceManager:
         ttk.Label(self.actions_content, text="(Adds a transaction to a Virtual category)", wraplength=300).grid(row=row, column=0, columnspan=4, pady=5, sticky="nsew")
 
     def on_tree_select(self, event):
-        self.clear_detail_frame()
-        selected = self.tree.selection()
-        if not selected:
+        """Debounce selection changes so rapid arrow-key navigation renders only the final row."""
+        self.request_refresh("details", delay=self.select_delay_ms)
+
+    def request_refresh(self, *parts, delay=0):
+        """Mark parts of the UI ("tree", "details", "chart") dirty and render them together later.
+
+        Requests made before the pending render runs are coalesced into it. A delayed
+        request replaces (cancels) a pending delayed one; an idle render is never postponed.
+        """
+        self.dirty.update(parts)
+        if self.refresh_job is not None:
+            if delay and not self.refresh_delay:
+                return
+            self.root.after_cancel(self.refresh_job)
+        self.refresh_delay = delay
+        self.refresh_job = self.root.after(delay, self.flush_refresh) if delay else self.root.after_idle(self.flush_refresh)
+
+    def flush_refresh(self):
+        """Render everything marked dirty, resolving the selected category only once."""
+        self.refresh_job = None
+        parts, self.dirty = self.dirty, set()
+        if "tree" in parts:
+            self.populate_tree()
+        path = self.get_selected_path(silent=True)
+        category = self.get_category(path) if path else None
+        if "details" in parts or "tree" in parts:
+            self.render_details(path, category)
+        self.update_history_button_state(category)
+        if self.chart is not None:
+            if path and path != self.chart["path"]:
+                self.chart["path"] = path
+                self.reset_chart_view()
+            elif "chart" in parts:
+                self.draw_chart()
+
+    def render_details(self, path, category):
+        """Show the detail view for a category, skipping the work if it is already on screen."""
+        if category is None:
+            self.clear_detail_frame()
             return
-        path = self.get_selected_path()
-        if not path:
+        key = (path, self.data_version)
+        if key == self.rendered_details:
             return
-        try:
-            category = self.get_category(path)
-            if category["type"] == "Cash":
-                self.show_cash_details(category)
-            elif category["type"] == "Summary":
-                self.show_summary_details(category)
-            else:
-                self.show_transaction_details(category)
-            self.update_history_button_state()
-        except KeyError:
-            messagebox.showerror("Error", f"Cannot load details for '{path}'.")
+        self.rendered_details = key
+        view_type = category["type"] if category["type"] in ("Cash", "Summary") else "Virtual"
+        for name, view in self.detail_views.items():
+            if name != view_type:
+                view["frame"].grid_remove()
+        if view_type == "Cash":
+            self.show_cash_details(category)
+        elif view_type == "Summary":
+            self.show_summary_details(category)
+        else:
+            self.show_transaction_details(category)
 
     def clear_detail_frame(self):
-        for widget in self.detail_content.winfo_children():
-            widget.destroy()
+        """Hide the detail views; they are kept and reused by the next render."""
+        for view in self.detail_views.values():
+            view["frame"].grid_remove()
+        self.rendered_details = None
 
     def show_cash_details(self, category):
-        canvas = tk.Canvas(self.detail_content)
-        v_scrollbar = ttk.Scrollbar(self.detail_content, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=v_scrollbar.set)
-
-        canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
-        self.detail_content.grid_rowconfigure(0, weight=1)
-        self.detail_content.grid_columnconfigure(0, weight=1)
-
-        ttk.Label(scrollable_frame, text="Bills (€):", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=0, columnspan=2, pady=5, sticky=tk.W)
-        bill_entries = {}
-        row = 1
-        for denom in sorted(category["denominations"]["bills"].keys(), key=int, reverse=True):
-            ttk.Label(scrollable_frame, text=f"{denom} €").grid(row=row, column=0, padx=5, sticky=tk.W)
-            entry = ttk.Entry(scrollable_frame, width=10)
-            entry.insert(0, str(category["denominations"]["bills"][denom]))
-            entry.grid(row=row, column=1, padx=5, pady=2)
-            bill_entries[denom] = entry
+        view = self.detail_views.get("Cash")
+        if view is None:
+            frame = ttk.Frame(self.detail_content)
+            frame.grid_rowconfigure(0, weight=1)
+            frame.grid_columnconfigure(0, weight=1)
+            canvas = tk.Canvas(frame)
+            v_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=canvas.yview)
+            scrollable_frame = ttk.Frame(canvas)
+
+            scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+            canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+            canvas.configure(yscrollcommand=v_scrollbar.set)
+
+            canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+            v_scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+            self.detail_content.grid_rowconfigure(0, weight=1)
+            self.detail_content.grid_columnconfigure(0, weight=1)
+            view = self.detail_views["Cash"] = {"frame": frame, "inner": scrollable_frame, "layout": None, "entries": {}, "category": None}
+
+        # Entries are only rebuilt when the set of denominations changes
+        currency = self.category_currency(category)
+        layout = (currency, tuple(category["denominations"]["bills"]), tuple(category["denominations"]["coins"]))
+        if view["layout"] != layout:
+            for widget in view["inner"].winfo_children():
+                widget.destroy()
+            view["entries"] = {}
+            scrollable_frame = view["inner"]
+            ttk.Label(scrollable_frame, text=f"Bills ({currency}):", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=0, columnspan=2, pady=5, sticky=tk.W)
+            row = 1
+            for denom in sorted(category["denominations"]["bills"].keys(), key=int, reverse=True):
+                ttk.Label(scrollable_frame, text=self.format_money(float(denom), currency, compact=True)).grid(row=row, column=0, padx=5, sticky=tk.W)
+                entry = ttk.Entry(scrollable_frame, width=10)
+                entry.grid(row=row, column=1, padx=5, pady=2)
+                view["entries"][("bills", denom)] = entry
+                row += 1
+
+            ttk.Label(scrollable_frame, text=f"Coins ({currency}):", font=("TkDefaultFont", 10, "bold")).grid(row=row, column=0, columnspan=2, pady=5, sticky=tk.W)
             row += 1
-
-        ttk.Label(scrollable_frame, text="Coins (€):", font=("TkDefaultFont", 10, "bold")).grid(row=row, column=0, columnspan=2, pady=5, sticky=tk.W)
-        row += 1
-        coin_entries = {}
-        for denom in sorted(category["denominations"]["coins"].keys(), key=float, reverse=True):
-            ttk.Label(scrollable_frame, text=f"{denom} €").grid(row=row, column=0, padx=5, sticky=tk.W)
-            entry = ttk.Entry(scrollable_frame, width=10)
-            entry.insert(0, str(category["denominations"]["coins"][denom]))
-            entry.grid(row=row, column=1, padx=5, pady=2)
-            coin_entries[denom] = entry
-            row += 1
-
-        def save_denominations():
-            try:
-                for denom, entry in bill_entries.items():
-                    value = entry.get().strip()
-                    if not value.isdigit():
-                        raise ValueError(f"Invalid count for {denom} € bill.")
-                    category["denominations"]["bills"][denom] = int(value)
-                for denom, entry in coin_entries.items():
-                    value = entry.get().strip()
-                    if not value.isdigit():
-                        raise ValueError(f"Invalid count for {denom} € coin.")
-                    category["denominations"]["coins"][denom] = int(value)
-                self.save_data()
-                self.populate_tree()
-                self.on_tree_select(None)
-            except ValueError as e:
-                messagebox.showerror("Error", str(e))
-
-        ttk.Button(scrollable_frame, text="Save Denominations", command=save_denominations).grid(row=row, column=0, columnspan=2, pady=10)
+            for denom in sorted(category["denominations"]["coins"].keys(), key=float, reverse=True):
+                ttk.Label(scrollable_frame, text=self.format_money(float(denom), currency, compact=True)).grid(row=row, column=0, padx=5, sticky=tk.W)
+                entry = ttk.Entry(scrollable_frame, width=10)
+                entry.grid(row=row, column=1, padx=5, pady=2)
+                view["entries"][("coins", denom)] = entry
+                row += 1
+
+            def save_denominations():
+                target = view["category"]
+                try:
+                    for (kind, denom), entry in view["entries"].items():
+                        value = entry.get().strip()
+                        if not value.isdigit():
+                            raise ValueError(f"Invalid count for {denom} {currency} {'bill' if kind == 'bills' else 'coin'}.")
+                    for (kind, denom), entry in view["entries"].items():
+                        target["denominations"][kind][denom] = int(entry.get().strip())
+                    self.save_data()
+                    self.request_refresh("tree", "details", "chart")
+                except ValueError as e:
+                    messagebox.showerror("Error", str(e))
+
+            ttk.Button(scrollable_frame, text="Save Denominations", command=save_denominations).grid(row=row, column=0, columnspan=2, pady=10)
+            view["layout"] = layout
+
+        view["category"] = category
+        for (kind, denom), entry in view["entries"].items():
+            entry.delete(0, tk.END)
+            entry.insert(0, str(category["denominations"][kind][denom]))
+        view["frame"].grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
     def show_transaction_details(self, category):
-        # Ensure transaction_tree is created and managed
-        if self.transaction_tree is None:
+        view = self.detail_views.get("Virtual")
+        if view is None:
             main_frame = ttk.Frame(self.detail_content, padding="5")
-            main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
             main_frame.grid_rowconfigure(0, weight=0)  # Treeview fixed height
             main_frame.grid_rowconfigure(1, weight=1)  # Extra space
             main_frame.grid_columnconfigure(0, weight=1)
             self.transaction_tree = ttk.Treeview(main_frame, columns=("Date", "Amount", "Description"), selectmode="none", height=10)
             self.transaction_tree.heading("Date", text="Date")
-            self.transaction_tree.heading("Amount", text="Amount (€)")
+            self.transaction_tree.heading("Amount", text="Amount")
             self.transaction_tree.heading("Description", text="Description")
             self.transaction_tree.column("#0", width=0, stretch=False, minwidth=0)
+            self.transaction_tree.column("Date", width=150, minwidth=150, stretch=False, anchor="center")
+            self.transaction_tree.column("Amount", width=100, minwidth=100, stretch=False, anchor="center")
+            self.transaction_tree.column("Description", width=300, minwidth=300, stretch=False, anchor="w")
             self.transaction_tree.grid(row=0, column=0, sticky=(tk.W, tk.E))
-        elif self.transaction_tree.winfo_exists() == 0:
-            self.transaction_tree = None  # Reset if destroyed
-            return self.show_transaction_details(category)  # Recreate
-
-        # Defer width calculation to ensure layout is ready
-        def set_columns():
-            if self.transaction_tree.winfo_exists():
-                self.root.update_idletasks()
-                detail_width = self.detail_content.winfo_width() or 600
+
+            # Size the description column whenever the layout settles instead of polling with a timer
+            def set_columns(event):
                 padding = 20
-                available_width = detail_width - padding
+                available_width = event.width - padding
                 min_total_width = 150 + 100 + 300
-                if available_width > min_total_width:
-                    extra_width = available_width - min_total_width
-                    desc_width = 300 + extra_width
-                else:
-                    desc_width = 300
-
-                self.transaction_tree.column("Date", width=150, minwidth=150, stretch=False, anchor="center")
-                self.transaction_tree.column("Amount", width=100, minwidth=100, stretch=False, anchor="center")
-                self.transaction_tree.column("Description", width=int(desc_width), minwidth=300, stretch=False, anchor="w")
-                populate_tree(detail_width, desc_width)
-            else:
-                print("Transaction tree no longer exists, skipping update")
-
-        def populate_tree(detail_width, desc_width):
-            if self.transaction_tree.winfo_exists():
-                self.transaction_tree.delete(*self.transaction_tree.get_children())
-                transactions = sorted(category["transactions"], key=lambda x: x.get("timestamp", ""), reverse=True)
-                for trans in transactions[:10]:
-                    self.transaction_tree.insert("", "end", values=(
-                        trans.get("timestamp", "N/A"),
-                        f"{trans.get('amount', 0.0):.2f}",
-                        trans.get("description", "(No description)")
-                    ))
-                self.root.update_idletasks()
-                tree_height = self.transaction_tree.winfo_reqheight() or 260
-                print(f"Detail width: {detail_width}, Description width: {desc_width}, Tree height: {tree_height}, Details height: {self.detail_frame.winfo_height()}")
-            else:
-                print("Transaction tree destroyed during population")
+                desc_width = 300 + max(0, available_width - min_total_width)
+                self.transaction_tree.column("Description", width=int(desc_width))
 
-        self.root.after(100, set_columns)  # Increased delay to 100ms
+            main_frame.bind("<Configure>", set_columns)
+            view = self.detail_views["Virtual"] = {"frame": main_frame}
+
+        self.transaction_tree.heading("Amount", text=f"Amount ({self.category_currency(category)})")
+        self.transaction_tree.delete(*self.transaction_tree.get_children())
+        for trans in heapq.nlargest(10, category["transactions"], key=lambda x: x.get("timestamp", "")):
+            self.transaction_tree.insert("", "end", values=(
+                trans.get("timestamp", "N/A"),
+                f"{trans.get('amount', 0.0):.2f}",
+                trans.get("description", "(No description)")
+            ))
+        view["frame"].grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
     def show_transaction_history_from_toolbar(self):
         path = self.get_selected_path()
@@ -654,7 +1177,7 @@ class FinanceManager:
         # Transaction Treeview with scrollbar
         tree = ttk.Treeview(main_frame, columns=("Date", "Amount", "Description"), selectmode="none")
         tree.heading("Date", text="Date")
-        tree.heading("Amount", text="Amount (€)")
+        tree.heading("Amount", text=f"Amount ({self.category_currency(category)})")
         tree.heading("Description", text="Description")
 
         # Hide the #0 column
@@ -707,45 +1230,479 @@ class FinanceManager:
         tree.update_idletasks()
         print(f"Popup actual width: {popup.winfo_width()}, Popup width: {popup_width}, Scrollbar width: {scrollbar_width}, Description width: {desc_width}, Tree width: {tree_width}, Tree height: {tree['height']}, Transactions: {len(transactions)}, Tree visible: {tree.winfo_ismapped()}")
 
+    def balance_series(self, path):
+        """Return (times, levels, start_balance) for a category and everything below it.
+
+        Transactions of the whole subtree are sorted and summed once, and the running
+        balance is downsampled into a min/max pyramid (levels[0] is the series itself);
+        the result is cached per path until the next save, so redraws never touch raw
+        transactions.
+        Amounts in other currencies are converted at the current rate; categories
+        without a rate are left out.
+        """
+        if path in self.series_cache:
+            return self.series_cache[path]
+        points = []
+        start_balance = 0.0
+        category = self.get_category(path)
+        currency = self.category_currency(category)
+        for _, node in self.walk_categories(category):
+            if node.get("type") == "Summary":
+                continue
+            try:
+                factor = self.convert(1.0, self.category_currency(node), currency)
+            except KeyError:
+                continue
+            if node.get("type") == "Cash":
+                start_balance += node.get("balance", 0.0) * factor  # No history, counts as a constant
+                continue
+            dated_total = 0.0
+            for trans in node.get("transactions", []):
+                try:
+                    amount = float(trans["amount"]) * factor
+                    points.append((datetime.fromisoformat(trans["timestamp"]).timestamp(), amount))
+                    dated_total += amount
+                except (KeyError, TypeError, ValueError):
+                    pass
+            start_balance += node.get("balance", 0.0) * factor - dated_total
+        points.sort(key=lambda p: p[0])
+        times = [t for t, _ in points]
+        balances = list(accumulate((amount for _, amount in points), initial=start_balance))[1:]
+        self.series_cache[path] = (times, self.balance_pyramid(balances), start_balance)
+        return self.series_cache[path]
+
+    def show_balance_chart(self):
+        path = self.get_selected_path()
+        if not path:
+            return
+        if self.chart is not None:
+            self.chart["path"] = path
+            self.chart["window"].lift()
+            self.reset_chart_view()
+            return
+        window = tk.Toplevel(self.root)
+        window.geometry("700x340")
+        window.minsize(400, 200)
+        window.grid_rowconfigure(0, weight=1)
+        window.grid_columnconfigure(0, weight=1)
+        canvas = tk.Canvas(window, background="white", highlightthickness=0)
+        canvas.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        ttk.Label(window, text="Mouse wheel: zoom, drag: pan, double-click: show everything", padding=(5, 2)).grid(row=1, column=0, sticky=tk.W)
+        self.chart = {"window": window, "canvas": canvas, "path": path, "view": (0.0, 1.0), "drag": None}
+
+        def on_close():
+            self.chart = None
+            window.destroy()
+
+        def on_zoom(event, factor):
+            t0, t1 = self.chart["view"]
+            left, width = 70, max(1, canvas.winfo_width() - 80)
+            anchor = t0 + (t1 - t0) * min(max((event.x - left) / width, 0.0), 1.0)
+            span = max((t1 - t0) * factor, 3600.0)
+            self.chart["view"] = self.clamp_chart_view(anchor - (anchor - t0) * span / (t1 - t0), anchor + (t1 - anchor) * span / (t1 - t0))
+            self.draw_chart()
+
+        def on_press(event):
+            self.chart["drag"] = (event.x, self.chart["view"])
+
+        def on_drag(event):
+            start_x, (t0, t1) = self.chart["drag"]
+            shift = (start_x - event.x) * (t1 - t0) / max(1, canvas.winfo_width() - 80)
+            self.chart["view"] = self.clamp_chart_view(t0 + shift, t1 + shift)
+            self.draw_chart()
+
+        window.protocol("WM_DELETE_WINDOW", on_close)
+        canvas.bind("<Configure>", lambda e: self.draw_chart())
+        canvas.bind("<MouseWheel>", lambda e: on_zoom(e, 0.8 if e.delta > 0 else 1.25))
+        canvas.bind("<Button-4>", lambda e: on_zoom(e, 0.8))
+        canvas.bind("<Button-5>", lambda e: on_zoom(e, 1.25))
+        canvas.bind("<ButtonPress-1>", on_press)
+        canvas.bind("<B1-Motion>", on_drag)
+        canvas.bind("<Double-Button-1>", lambda e: self.reset_chart_view())
+        self.reset_chart_view()
+
+    def reset_chart_view(self):
+        """Fit the chart view to the whole history of the charted category."""
+        try:
+            times = self.balance_series(self.chart["path"])[0]
+        except KeyError:
+            self.chart["window"].destroy()
+            self.chart = None
+            return
+        if times and times[-1] > times[0]:
+            padding = (times[-1] - times[0]) * 0.02
+            self.chart["view"] = self.clamp_chart_view(times[0] - padding, times[-1] + padding)
+        else:
+            center = times[0] if times else time.time()
+            self.chart["view"] = self.clamp_chart_view(center - 86400.0, center + 86400.0)
+        self.draw_chart()
+
+    def clamp_chart_view(self, t0, t1):
+        """Keep a view within the charted history plus padding, and within CHART_TIME_RANGE."""
+        times = self.balance_series(self.chart["path"])[0]
+        first, last = (times[0], times[-1]) if times else (time.time(), time.time())
+        padding = max((last - first) * 0.5, 86400.0)
+        lower = max(first - padding, self.CHART_TIME_RANGE[0])
+        upper = max(min(last + padding, self.CHART_TIME_RANGE[1]), lower + 3600.0)
+        span = min(max(t1 - t0, 3600.0), upper - lower)
+        t0 = min(max(t0, lower), upper - span)
+        return t0, t0 + span
+
+    def balance_pyramid(self, balances):
+        """Precompute min/max levels over blocks of 1, 2, 4, ... consecutive running balances."""
+        levels = [(balances, balances)]
+        mins = maxs = balances
+        while len(mins) > 1:
+            odd_min, odd_max = mins[-1:] if len(mins) % 2 else [], maxs[-1:] if len(maxs) % 2 else []
+            mins = [a if a < b else b for a, b in zip(mins[0::2], mins[1::2])] + odd_min
+            maxs = [a if a > b else b for a, b in zip(maxs[0::2], maxs[1::2])] + odd_max
+            levels.append((mins, maxs))
+        return levels
+
+    def chart_buckets(self, times, levels, start_balance, t0, t1, columns):
+        """Downsample the running balance to one (min, max) pair per pixel column.
+
+        Each column reads a handful of blocks from the pyramid level whose block size
+        is about a quarter of a column, so a redraw is O(columns * log n) whatever the
+        zoom. Blocks straddling a column edge count for both columns, which can only
+        widen a bucket slightly, never hide a spike.
+        """
+        balances = levels[0][0]
+        lo = bisect.bisect_right(times, t0)
+        per_column = (bisect.bisect_right(times, t1, lo) - lo) / columns
+        level = 0
+        while level + 1 < len(levels) and (1 << (level + 1)) * 4 <= per_column:
+            level += 1
+        mins, maxs = levels[level]
+        current = balances[lo - 1] if lo else start_balance
+        step = (t1 - t0) / columns
+        buckets = []
+        for column in range(columns):
+            hi = bisect.bisect_right(times, t0 + (column + 1) * step, lo)
+            if hi > lo:
+                first, last = lo >> level, ((hi - 1) >> level) + 1
+                low, high = min(mins[first:last]), max(maxs[first:last])
+                buckets.append((min(low, current), max(high, current)))
+                current = balances[hi - 1]
+                lo = hi
+            else:
+                buckets.append((current, current))
+        return buckets
+
+    def draw_chart(self):
+        if self.chart is None:
+            return
+        canvas = self.chart["canvas"]
+        path = self.chart["path"]
+        try:
+            times, levels, start_balance = self.balance_series(path)
+        except KeyError:
+            return
+        width, height = canvas.winfo_width(), canvas.winfo_height()
+        left, right, top, bottom = 70, 10, 25, 25
+        columns = width - left - right
+        if columns < 2 or height - top - bottom < 2:
+            return
+        t0, t1 = self.chart["view"]
+        buckets = self.chart_buckets(times, levels, start_balance, t0, t1, columns)
+        low = min(b[0] for b in buckets)
+        high = max(b[1] for b in buckets)
+        if high - low < 0.01:
+            low, high = low - 1.0, high + 1.0
+        scale = (height - top - bottom) / (high - low)
+
+        def y_of(value):
+            return height - bottom - (value - low) * scale
+
+        canvas.delete("all")
+        self.chart["window"].title(f"Balance Chart - {path}")
+        canvas.create_text(left, 5, text=f"{path}: {self.format_money(self.calculate_balance(self.get_category(path), path), self.category_currency(self.get_category(path)))}", anchor="nw", font=("TkDefaultFont", 10, "bold"))
+        canvas.create_rectangle(left, top, width - right, height - bottom, outline="#c0c0c0")
+        for i in range(5):
+            value = low + (high - low) * i / 4
+            canvas.create_line(left, y_of(value), width - right, y_of(value), fill="#eeeeee")
+            canvas.create_text(left - 5, y_of(value), text=f"{value:.2f}", anchor="e")
+        for i in range(3):
+            stamp = t0 + (t1 - t0) * i / 2
+            canvas.create_text(left + columns * i / 2, height - bottom + 5, text=datetime.fromtimestamp(stamp).strftime("%Y-%m-%d"),
+                               anchor=("nw", "n", "ne")[i])
+        if low < 0 < high:
+            canvas.create_line(left, y_of(0), width - right, y_of(0), fill="#999999", dash=(2, 2))
+        coords = []
+        for column, (bucket_low, bucket_high) in enumerate(buckets):
+            x = left + column
+            coords.extend((x, y_of(bucket_low), x, y_of(bucket_high)))
+        canvas.create_line(*coords, fill="#1f6fb2")
+
+    def parse_statement_date(self, text):
+        text = text.strip().split(" ")[0].split("T")[0]
+        for fmt in ("%Y-%m-%d", "%d.%m.%Y", "%d/%m/%Y", "%Y/%m/%d", "%d-%m-%Y"):
+            try:
+                return datetime.strptime(text, fmt).date()
+            except ValueError:
+                pass
+        raise ValueError(f"Unrecognized date '{text}'")
+
+    def parse_statement_amount(self, text):
+        """Parse amounts like '-12.50', '1.234,56' or '1,234.56'; a lone comma is a decimal comma."""
+        text = text.strip().replace(" ", "").replace("\u00a0", "")
+        for symbol in self.CURRENCY_SYMBOLS.values():
+            text = text.replace(symbol, "")
+        if "," in text and "." in text:
+            if text.rfind(",") > text.rfind("."):
+                text = text.replace(".", "").replace(",", ".")
+            else:
+                text = text.replace(",", "")
+        elif "," in text:
+            text = text.replace(",", ".")
+        return float(text)
+
+    def read_statement(self, file_path):
+        """Read a CSV bank statement into (lines, skipped_rows).
+
+        Columns are found by a header row naming date, amount and description
+        (English or German bank export names); without a header they are taken in
+        that order, and a first row that does not parse is treated as a header.
+        """
+        with open(file_path, newline="", encoding="utf-8-sig") as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            rows = [row for row in csv.reader(f, dialect) if any(cell.strip() for cell in row)]
+        if not rows:
+            raise ValueError("The statement file is empty.")
+        header = [cell.strip().lower() for cell in rows[0]]
+
+        def column(*names):
+            return next((i for i, cell in enumerate(header) if any(name in cell for name in names)), None)
+
+        date_col = column("date", "datum", "buchungstag", "valuta", "wert")
+        amount_col = column("amount", "betrag", "umsatz")
+        desc_col = column("desc", "memo", "text", "payee", "purpose", "verwendungszweck")
+        has_header = date_col is not None and amount_col is not None
+        if has_header:
+            rows = rows[1:]
+        else:
+            date_col, amount_col, desc_col = 0, 1, 2
+        lines, skipped = [], []
+        for number, row in enumerate(rows, start=1):
+            try:
+                lines.append({
+                    "date": self.parse_statement_date(row[date_col]),
+                    "amount": self.parse_statement_amount(row[amount_col]),
+                    "description": row[desc_col].strip() if desc_col is not None and desc_col < len(row) else "",
+                    "line": number
+                })
+            except (IndexError, ValueError):
+                if number > 1 or has_header:
+                    skipped.append(number)
+        return lines, skipped
+
+    def match_statement(self, transactions, lines, tolerance_days):
+        """Match statement lines to ledger transactions by exact amount and a date within the tolerance.
+
+        Unreconciled ledger entries are matched first; lines left over are then tried
+        against entries an earlier statement already reconciled, so overlapping
+        statements are not suggested twice. Returns (matches, unmatched_ledger,
+        unmatched_statement); matches are (transaction, line) pairs. Only unreconciled
+        ledger entries inside the statement's date range are reported as unmatched.
+        """
+        if not lines:
+            return [], [], []
+        first = min(line["date"] for line in lines).toordinal() - tolerance_days
+        last = max(line["date"] for line in lines).toordinal() + tolerance_days
+        open_entries, reconciled_entries = [], []
+        for trans in transactions:
+            try:
+                day = date.fromisoformat(trans["timestamp"][:10]).toordinal()
+                cents = round(float(trans["amount"]) * 100)
+            except (KeyError, TypeError, ValueError):
+                continue
+            if first <= day <= last:
+                (reconciled_entries if trans.get("reconciled") else open_entries).append((cents, day, trans))
+        lines = sorted(lines, key=lambda l: l["date"])
+        matches, unmatched_statement, unmatched_ledger = self.match_entries(open_entries, lines, tolerance_days)
+        matches += self.match_entries(reconciled_entries, unmatched_statement, tolerance_days)[0]
+        matched_lines = {id(line) for _, line in matches}
+        unmatched_statement = [line for line in lines if id(line) not in matched_lines]
+        return matches, unmatched_ledger, unmatched_statement
+
+    def match_entries(self, entries, lines, tolerance_days):
+        """Greedily match date-sorted lines to (cents, day, transaction) entries of the same amount.
+
+        Each line takes the earliest unused entry at or after its day minus the
+        tolerance, which is a maximum matching when every window has the same width.
+        Entries are bucketed by amount and sorted by date; each bucket keeps a pointer
+        to its first unused entry, so after sorting every entry is visited once.
+        """
+        buckets = {}
+        for cents, day, trans in entries:
+            buckets.setdefault(cents, []).append((day, trans))
+        for bucket in buckets.values():
+            bucket.sort(key=lambda entry: entry[0])
+        pointers = dict.fromkeys(buckets, 0)
+        matches, unmatched_lines, unmatched_entries = [], [], []
+        for line in lines:
+            cents = round(line["amount"] * 100)
+            bucket = buckets.get(cents, [])
+            day = line["date"].toordinal()
+            pos = pointers.get(cents, 0)
+            while pos < len(bucket) and bucket[pos][0] < day - tolerance_days:
+                unmatched_entries.append(bucket[pos][1])  # Too early for this and every later line
+                pos += 1
+            if pos < len(bucket) and bucket[pos][0] <= day + tolerance_days:
+                matches.append((bucket[pos][1], line))
+                pos += 1
+            else:
+                unmatched_lines.append(line)
+            if bucket:
+                pointers[cents] = pos
+        for cents, bucket in buckets.items():
+            unmatched_entries.extend(trans for _, trans in bucket[pointers[cents]:])
+        return matches, unmatched_lines, unmatched_entries
+
+    def show_reconcile_window(self):
+        path = self.get_selected_path()
+        if not path:
+            return
+        category = self.get_category(path)
+        if category["type"] != "Virtual":
+            messagebox.showerror("Error", "Only Virtual categories can be reconciled.")
+            return
+        file_path = filedialog.askopenfilename(title=f"Bank statement for '{path}'", filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not file_path:
+            return
+        try:
+            lines, skipped = self.read_statement(file_path)
+        except (OSError, ValueError, csv.Error) as e:
+            messagebox.showerror("Error", f"Cannot read statement: {str(e)}")
+            return
+
+        popup = tk.Toplevel(self.root)
+        popup.title(f"Reconcile - {path}")
+        popup.geometry("760x420")
+        popup.grid_rowconfigure(1, weight=1)
+        popup.grid_columnconfigure(0, weight=1)
+
+        controls = ttk.Frame(popup, padding="5")
+        controls.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        ttk.Label(controls, text="Date tolerance (days):").grid(row=0, column=0, padx=5)
+        tolerance_var = tk.StringVar(value="3")
+        ttk.Spinbox(controls, from_=0, to=31, width=4, textvariable=tolerance_var).grid(row=0, column=1, padx=5)
+        summary_label = ttk.Label(controls, text="")
+        summary_label.grid(row=0, column=3, padx=10, sticky=tk.W)
+
+        tree = ttk.Treeview(popup, columns=("Action", "Date", "Amount", "Description"), selectmode="extended")
+        tree.column("#0", width=0, stretch=False, minwidth=0)
+        for name, width in (("Action", 150), ("Date", 100), ("Amount", 100), ("Description", 370)):
+            tree.heading(name, text=name)
+            tree.column(name, width=width, minwidth=width, stretch=(name == "Description"), anchor="w" if name in ("Action", "Description") else "center")
+        tree.tag_configure("ledger", foreground="#b22222")
+        v_scrollbar = ttk.Scrollbar(popup, orient="vertical", command=tree.yview, style="Narrow.Vertical.TScrollbar")
+        tree.configure(yscrollcommand=v_scrollbar.set)
+        tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        v_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+
+        mark_var = tk.BooleanVar(value=True)
+        bottom = ttk.Frame(popup, padding="5")
+        bottom.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E))
+        mark_check = ttk.Checkbutton(bottom, variable=mark_var)
+        mark_check.grid(row=0, column=0, padx=5, sticky=tk.W)
+        ttk.Label(bottom, text="Selected \"Add to ledger\" rows are added as reconciled transactions.").grid(row=1, column=0, padx=5, sticky=tk.W)
+        state = {"matches": [], "missing": {}}
+
+        def run_match():
+            try:
+                tolerance = int(tolerance_var.get())
+            except ValueError:
+                messagebox.showerror("Error", "Tolerance must be a whole number of days.", parent=popup)
+                return
+            matches, unmatched_ledger, unmatched_statement = self.match_statement(category["transactions"], lines, max(0, tolerance))
+            state["matches"] = [trans for trans, _ in matches if not trans.get("reconciled")]
+            state["missing"] = {}
+            tree.delete(*tree.get_children())
+            for line in unmatched_statement:
+                iid = tree.insert("", "end", values=("Add to ledger", line["date"].isoformat(), f"{line['amount']:.2f}", line["description"]))
+                state["missing"][iid] = line
+            for trans in unmatched_ledger:
+                tree.insert("", "end", values=("Not on statement", trans.get("timestamp", "N/A")[:10], f"{trans.get('amount', 0.0):.2f}",
+                                               trans.get("description", "")), tags=("ledger",))
+            tree.selection_set(tuple(state["missing"]))
+            mark_check.config(text=f"Mark {len(state['matches'])} matched transactions as reconciled")
+            summary_label.config(text=f"{len(matches)} matched, {len(unmatched_statement)} only on statement, "
+                                      f"{len(unmatched_ledger)} only in ledger" + (f", {len(skipped)} unreadable lines" if skipped else ""))
+
+        def apply_fixes():
+            added = 0
+            for iid in tree.selection():
+                line = state["missing"].get(iid)
+                if line is None:
+                    continue
+                category["transactions"].append({
+                    "id": str(uuid.uuid4()),
+                    "amount": line["amount"],
+                    "description": line["description"],
+                    "timestamp": f"{line['date'].isoformat()} 00:00:00",
+                    "reconciled": True
+                })
+                category["balance"] += line["amount"]
+                added += 1
+            marked = len(state["matches"]) if mark_var.get() else 0
+            for trans in state["matches"][:marked]:
+                trans["reconciled"] = True
+            if added or marked:
+                self.save_data()
+                self.request_refresh("tree", "details", "chart")
+            messagebox.showinfo("Reconcile", f"Added {added} transactions and marked {marked} as reconciled.", parent=popup)
+            popup.destroy()
+
+        ttk.Button(controls, text="Re-match", command=run_match).grid(row=0, column=2, padx=5)
+        ttk.Button(bottom, text="Apply", command=apply_fixes).grid(row=0, column=1, rowspan=2, padx=5)
+        ttk.Button(bottom, text="Close", command=popup.destroy).grid(row=0, column=2, rowspan=2, padx=5)
+        bottom.grid_columnconfigure(0, weight=1)
+        run_match()
+
     def show_summary_details(self, category):
-        # Create main frame
-        main_frame = ttk.Frame(self.detail_content, padding="5")
-        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        main_frame.grid_rowconfigure(0, weight=0)  # Label row
-        main_frame.grid_rowconfigure(1, weight=1)  # Child list row
-        main_frame.grid_columnconfigure(0, weight=1)
+        view = self.detail_views.get("Summary")
+        if view is None:
+            # Create main frame
+            main_frame = ttk.Frame(self.detail_content, padding="5")
+            main_frame.grid_rowconfigure(0, weight=0)  # Label row
+            main_frame.grid_rowconfigure(1, weight=1)  # Child list row
+            main_frame.grid_columnconfigure(0, weight=1)
 
-        # Add "Wallets:" label
-        ttk.Label(main_frame, text="Wallets:", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=0, pady=(0, 5), sticky=tk.W)
+            # Add "Wallets:" label
+            ttk.Label(main_frame, text="Wallets:", font=("TkDefaultFont", 10, "bold")).grid(row=0, column=0, pady=(0, 5), sticky=tk.W)
 
-        # Create frame for child list
-        child_frame = ttk.Frame(main_frame)
-        child_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        child_frame.grid_columnconfigure(0, weight=1)
+            # Create frame for child list
+            child_frame = ttk.Frame(main_frame)
+            child_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+            child_frame.grid_columnconfigure(0, weight=1)
+            view = self.detail_views["Summary"] = {"frame": main_frame, "child_frame": child_frame, "labels": []}
 
-        # Populate child list or show "None"
+        # Reuse the child labels, creating more only when a summary has more children than before
         children = category["children"]
-        if not children:
-            ttk.Label(child_frame, text="None").grid(row=0, column=0, padx=10, pady=5, sticky=tk.W)
-        else:
-            for i, (name, data) in enumerate(sorted(children.items())):
-                child_text = f"{name} ({data['type']})"
-                print(f"Adding child: {child_text}")
-                ttk.Label(child_frame, text=child_text).grid(row=i, column=0, padx=10, pady=2, sticky=tk.W)
-
-        main_frame.update_idletasks()
-        print(f"Summary details height: {main_frame.winfo_height()}, Details height: {self.detail_frame.winfo_height()}")
+        lines = [f"{name} ({data['type']})" for name, data in sorted(children.items())] or ["None"]
+        labels = view["labels"]
+        while len(labels) < len(lines):
+            labels.append(ttk.Label(view["child_frame"]))
+        for i, label in enumerate(labels):
+            if i < len(lines):
+                label.config(text=lines[i])
+                label.grid(row=i, column=0, padx=10, pady=5 if not children else 2, sticky=tk.W)
+            else:
+                label.grid_remove()
+        view["frame"].grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
 
-    def update_history_button_state(self):
-        path = self.get_selected_path(silent=True) if self.tree.get_children() else None
-        if path:
-            try:
-                category = self.get_category(path)
-                self.history_button.config(state="normal" if category.get("transactions", []) else "disabled")
-            except KeyError:
-                self.history_button.config(state="disabled")
-        else:
-            self.history_button.config(state="disabled")
+    def update_history_button_state(self, category=None):
+        """Enable the history button if the category (default: the selected one) has transactions."""
+        if category is None:
+            path = self.get_selected_path(silent=True) if self.tree.get_children() else None
+            category = self.get_category(path) if path else None
+        self.history_button.config(state="normal" if category and category.get("transactions", []) else "disabled")
 
     def get_selected_path(self, silent=False):
         selected = self.tree.selection()
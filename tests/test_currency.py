@@ -0,0 +1,127 @@
+import os
+import queue
+import sys
+import tempfile
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Finance import FinanceManager
+
+
+def make_categories(manager):
+    dollars = {"children": {}, "type": "Cash", "balance": 500.0, "transactions": [], "currency": "USD",
+               "denominations": manager.new_denominations("USD")}
+    dollars["denominations"]["bills"]["100"] = 5
+    return {
+        "children": {
+            "Wallets": {
+                "children": {
+                    "Dollars": dollars,
+                    "Card": {"children": {}, "type": "Virtual", "balance": 120.0, "transactions": [], "currency": "EUR"}
+                },
+                "type": "Summary",
+                "balance": 0.0,
+                "transactions": []
+            },
+            "Trip": {
+                "children": {
+                    "Fees": {"children": {}, "type": "Virtual", "balance": 10.0, "transactions": [], "currency": "EUR"}
+                },
+                "type": "Virtual",
+                "balance": 50.0,
+                "transactions": [],
+                "currency": "USD"
+            }
+        },
+        "type": "Virtual",
+        "balance": 0.0,
+        "transactions": [],
+        "currency": "EUR"
+    }
+
+
+class CurrencyTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch("Finance.messagebox")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Only the data-handling attributes; __init__ would build the Tk window
+        manager = self.manager = FinanceManager.__new__(FinanceManager)
+        manager.data_file = os.path.join(directory.name, "finance_data.json")
+        manager.backup_count = 5
+        manager.verify_results = queue.Queue()
+        manager.file_lock = threading.Lock()
+        manager.series_cache = {}
+        manager.rollup_cache = {}
+        manager.last_manifest = {}
+        manager.data_version = 0
+        manager.start_background_verify = lambda: None
+        manager.request_refresh = lambda *parts, delay=0: None
+        manager.rates = {"pivot": "EUR", "rates": {"USD": {"2020-01-01": 2.0, "2025-01-01": 1.25}, "GBP": {"2025-01-01": 0.8}}}
+        manager.update_current_rates()
+        manager.categories = make_categories(manager)
+        manager.save_data()
+        manager.calculate_total_balance()  # Fill the rollup cache
+
+    def test_convert(self):
+        self.assertEqual(self.manager.convert(10.0, "EUR", "EUR"), 10.0)
+        self.assertAlmostEqual(self.manager.convert(10.0, "EUR", "USD"), 12.5)
+        self.assertAlmostEqual(self.manager.convert(12.5, "USD", "GBP"), 8.0)
+        with self.assertRaises(KeyError):
+            self.manager.convert(1.0, "EUR", "JPY")
+
+    def test_rollups_convert_into_parent_currency(self):
+        self.assertAlmostEqual(self.manager.rollup_cache["Wallets"][0], 500 / 1.25 + 120)
+        self.assertAlmostEqual(self.manager.rollup_cache["Trip"][0], 50 + 10 * 1.25)
+        self.assertAlmostEqual(self.manager.calculate_total_balance(), 520 + 50)
+
+    def test_edit_invalidates_only_its_branch(self):
+        card = self.manager.categories["children"]["Wallets"]["children"]["Card"]
+        card["balance"] += 30.0
+        self.manager.save_data()
+        for path in ("Wallets.Card", "Wallets", ""):
+            self.assertNotIn(path, self.manager.rollup_cache)
+        for path in ("Wallets.Dollars", "Trip", "Trip.Fees"):
+            self.assertIn(path, self.manager.rollup_cache)
+        self.assertAlmostEqual(self.manager.calculate_total_balance(), 600)
+
+    def test_rename_invalidates_old_paths(self):
+        children = self.manager.categories["children"]
+        children["Journey"] = children.pop("Trip")
+        self.manager.save_data()
+        for path in ("Trip", "Trip.Fees", ""):
+            self.assertNotIn(path, self.manager.rollup_cache)
+        self.assertIn("Wallets", self.manager.rollup_cache)
+        self.assertAlmostEqual(self.manager.calculate_total_balance(), 570)
+        self.assertAlmostEqual(self.manager.rollup_cache["Journey"][0], 62.5)
+
+    def test_delete_invalidates_ancestors(self):
+        del self.manager.categories["children"]["Wallets"]["children"]["Dollars"]
+        self.manager.save_data()
+        for path in ("Wallets.Dollars", "Wallets", ""):
+            self.assertNotIn(path, self.manager.rollup_cache)
+        self.assertAlmostEqual(self.manager.calculate_total_balance(), 170)
+
+    def test_base_currency_change_moves_summaries(self):
+        self.manager.base_currency_var = SimpleNamespace(get=lambda: "USD")
+        self.manager.on_base_currency_change(None)
+        self.assertAlmostEqual(self.manager.calculate_total_balance(), 500 + 120 * 1.25 + 62.5)
+        self.assertAlmostEqual(self.manager.rollup_cache["Wallets"][0], 650)
+        self.assertEqual(self.manager.category_currency(self.manager.categories["children"]["Wallets"]), "USD")
+
+    def test_missing_rate_reaches_the_total(self):
+        self.manager.rates["rates"].pop("USD")
+        self.manager.update_current_rates()
+        self.assertEqual(self.manager.rollup_cache, {})
+        self.assertAlmostEqual(self.manager.calculate_total_balance(), 120)
+        self.assertEqual(self.manager.rollup_cache[""][1], frozenset({"USD"}))
+        self.assertEqual(self.manager.rollup_cache["Wallets"][1], frozenset({"USD"}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import copy
+import json
+import os
+import queue
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Finance import FinanceManager
+
+SAMPLE = {
+    "children": {
+        "Groceries": {
+            "children": {},
+            "type": "Virtual",
+            "balance": 30.0,
+            "transactions": [
+                {"id": "a", "amount": 50.0, "description": "Budget", "timestamp": "2025-03-01 10:00:00"},
+                {"id": "b", "amount": -20.0, "description": "Market", "timestamp": "2025-03-02 10:00:00"}
+            ],
+            "currency": "EUR"
+        },
+        "Savings": {
+            "children": {
+                "Bank": {"children": {}, "type": "Virtual", "balance": 100.0, "currency": "EUR",
+                         "transactions": [{"id": "c", "amount": 100.0, "description": "", "timestamp": "2025-03-03 10:00:00"}]}
+            },
+            "type": "Summary",
+            "balance": 0.0,
+            "transactions": []
+        }
+    },
+    "type": "Virtual",
+    "balance": 0.0,
+    "transactions": [],
+    "currency": "EUR"
+}
+
+
+def make_manager(directory):
+    # Only the data-handling attributes; __init__ would build the Tk window
+    manager = FinanceManager.__new__(FinanceManager)
+    manager.data_file = os.path.join(directory, "finance_data.json")
+    manager.snapshot_file = manager.data_file + ".good"
+    manager.backup_count = 5
+    manager.verify_results = queue.Queue()
+    manager.file_lock = threading.Lock()
+    manager.ignored_drift = set()
+    manager.series_cache = {}
+    manager.rollup_cache = {}
+    manager.last_manifest = {}
+    manager.data_version = 0
+    manager.start_background_verify = lambda: None
+    manager.categories = copy.deepcopy(SAMPLE)
+    return manager
+
+
+class IntegrityTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        patcher = mock.patch("Finance.messagebox")
+        self.messagebox = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.manager = make_manager(directory.name)
+
+    def read_file(self, path=None):
+        with open(path or self.manager.data_file) as f:
+            return json.load(f)
+
+    def write_file(self, data):
+        with open(self.manager.data_file, "w") as f:
+            json.dump(data, f)
+
+    def test_manifest_verifies_clean(self):
+        manifest = self.manager.build_manifest()
+        self.assertEqual(manifest["Groceries"]["count"], 2)
+        self.assertEqual(manifest["Groceries"]["total"], 30.0)
+        self.assertEqual(set(manifest), {"", "Groceries", "Savings", "Savings.Bank"})
+        self.assertEqual(self.manager.verify_categories(self.manager.categories, manifest), [])
+
+    def test_verify_pinpoints_damage(self):
+        manifest = self.manager.build_manifest()
+        damaged = copy.deepcopy(self.manager.categories)
+        damaged["children"]["Groceries"]["transactions"].pop()
+        del damaged["children"]["Savings"]["children"]["Bank"]
+        damaged["children"]["Extra"] = {"children": {}, "type": "Virtual", "balance": 0.0, "transactions": []}
+        issues = {(path, kind) for path, kind, _ in self.manager.verify_categories(damaged, manifest)}
+        self.assertIn(("Groceries", "corrupt"), issues)
+        self.assertIn(("Groceries", "drift"), issues)
+        self.assertIn(("Savings.Bank", "missing"), issues)
+        self.assertIn(("Extra", "unexpected"), issues)
+        self.assertNotIn(("Savings", "corrupt"), issues)
+
+    def test_rotate_backups_keeps_the_previous_saves(self):
+        for balance in range(7):
+            self.manager.categories["balance"] = float(balance)
+            self.manager.save_data()
+        self.assertEqual(self.read_file()["balance"], 6.0)
+        for i in range(1, 6):
+            self.assertEqual(self.read_file(f"{self.manager.data_file}.{i}")["balance"], 6.0 - i)
+        self.assertFalse(os.path.exists(f"{self.manager.data_file}.6"))
+        self.assertFalse(os.path.exists(self.manager.data_file + ".tmp"))
+
+    def test_repair_restores_only_the_damaged_category_from_backup(self):
+        self.manager.save_data()
+        self.manager.save_data()
+        data = self.read_file()
+        data["children"]["Groceries"]["transactions"][1]["amount"] = -999.0
+        self.write_file(data)
+        self.manager.load_data()
+        groceries = self.manager.categories["children"]["Groceries"]
+        self.assertEqual(groceries["transactions"][1]["amount"], -20.0)
+        self.assertEqual(self.manager.categories["children"]["Savings"], SAMPLE["children"]["Savings"])
+        self.assertIn("Groceries from", self.messagebox.showwarning.call_args[0][1])
+        self.assertEqual(self.read_file()["children"]["Groceries"]["transactions"][1]["amount"], -20.0)
+        # The damaged file was overwritten in place, not rotated into the backups
+        self.assertEqual(self.read_file(self.manager.data_file + ".1")["children"]["Groceries"]["transactions"][1]["amount"], -20.0)
+
+    def test_recover_truncated_file_from_backup(self):
+        self.manager.save_data()
+        self.manager.save_data()
+        with open(self.manager.data_file, "r+") as f:
+            f.truncate(200)
+        self.manager.categories = {}
+        self.manager.load_data()
+        self.assertEqual(self.manager.categories["children"]["Groceries"]["balance"], 30.0)
+        self.assertTrue(os.path.exists(self.manager.data_file + ".corrupt"))
+        self.read_file()
+        self.read_file(self.manager.data_file + ".1")  # Still a good backup, not the truncated file
+
+    def test_background_verify_reports_damage_on_disk(self):
+        self.manager.save_data()
+        data = self.read_file()
+        data["children"]["Savings"]["children"]["Bank"]["balance"] = 5.0
+        self.write_file(data)
+        self.manager.verify_data_file()
+        issues = {(path, kind) for path, kind, _ in self.manager.verify_results.get_nowait()}
+        self.assertEqual(issues, {("Savings.Bank", "corrupt"), ("Savings.Bank", "drift")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import sys
+import tempfile
+import unittest
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from Finance import FinanceManager
+
+
+def ledger_entry(day, amount, reconciled=False):
+    trans = {"id": day, "amount": amount, "description": "", "timestamp": f"{day} 12:00:00"}
+    if reconciled:
+        trans["reconciled"] = True
+    return trans
+
+
+def statement_line(day, amount):
+    return {"date": date.fromisoformat(day), "amount": amount, "description": "", "line": 0}
+
+
+class MatchStatementTest(unittest.TestCase):
+    def setUp(self):
+        # The matcher does not touch Tk, so skip __init__ and its window setup
+        self.manager = FinanceManager.__new__(FinanceManager)
+
+    def test_crossing_windows_match_everything(self):
+        ledger = [ledger_entry("2025-03-01", -20.0), ledger_entry("2025-03-04", -20.0)]
+        lines = [statement_line("2025-03-03", -20.0), statement_line("2025-03-07", -20.0)]
+        matches, unmatched_ledger, unmatched_statement = self.manager.match_statement(ledger, lines, 3)
+        self.assertEqual(len(matches), 2)
+        self.assertEqual(unmatched_ledger, [])
+        self.assertEqual(unmatched_statement, [])
+
+    def test_unmatched_on_both_sides(self):
+        ledger = [ledger_entry("2025-03-01", -20.0), ledger_entry("2025-03-02", 15.5)]
+        lines = [statement_line("2025-03-01", -20.0), statement_line("2025-03-09", -7.25)]
+        matches, unmatched_ledger, unmatched_statement = self.manager.match_statement(ledger, lines, 3)
+        self.assertEqual([(trans["id"], line["amount"]) for trans, line in matches], [("2025-03-01", -20.0)])
+        self.assertEqual([trans["id"] for trans in unmatched_ledger], ["2025-03-02"])
+        self.assertEqual([line["amount"] for line in unmatched_statement], [-7.25])
+
+    def test_reconciled_entries_rank_below_open_ones(self):
+        ledger = [ledger_entry("2025-03-02", -5.0, reconciled=True), ledger_entry("2025-03-03", -5.0)]
+        lines = [statement_line("2025-03-02", -5.0)]
+        matches, unmatched_ledger, unmatched_statement = self.manager.match_statement(ledger, lines, 3)
+        self.assertEqual([trans["id"] for trans, _ in matches], ["2025-03-03"])
+        self.assertEqual(unmatched_ledger, [])
+
+    def test_reconciled_entries_still_absorb_overlapping_lines(self):
+        ledger = [ledger_entry("2025-03-02", -5.0, reconciled=True)]
+        lines = [statement_line("2025-03-02", -5.0)]
+        matches, unmatched_ledger, unmatched_statement = self.manager.match_statement(ledger, lines, 3)
+        self.assertEqual(len(matches), 1)
+        self.assertEqual(unmatched_statement, [])
+
+
+class ReadStatementTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = FinanceManager.__new__(FinanceManager)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def read(self, text):
+        path = os.path.join(self.directory.name, "statement.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return self.manager.read_statement(path)
+
+    def test_german_export_header(self):
+        lines, skipped = self.read("Verwendungszweck;Buchungstag;Betrag\nMiete;01.03.2025;-1.234,50\nGehalt;28.03.2025;2.500,00\n")
+        self.assertEqual(skipped, [])
+        self.assertEqual([(line["date"], line["amount"], line["description"]) for line in lines],
+                         [(date(2025, 3, 1), -1234.5, "Miete"), (date(2025, 3, 28), 2500.0, "Gehalt")])
+
+    def test_unrecognized_header_is_not_an_unreadable_line(self):
+        lines, skipped = self.read("When,How much,What\n2025-03-01,-20.00,Groceries\n2025-03-02,oops,Bad row\n")
+        self.assertEqual([line["amount"] for line in lines], [-20.0])
+        self.assertEqual(skipped, [3])
+
+
+if __name__ == "__main__":
+    unittest.main()